@@ -42,17 +42,104 @@ import gc
 import time
 import wiznet
 import socket
-import adafruit_requests as requests
+try:
+    import adafruit_requests as requests
+except ImportError:
+    # HTTP helpers are unavailable without adafruit_requests
+    requests = None
 
 __version__ = "0.0.0-auto.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_EthernetManager.git"
 
+# Status LED colors
+_LED_BUSY = (0, 0, 100)
+_LED_OK = (0, 100, 0)
+_LED_WAIT = (100, 0, 0)
+_LED_OFF = 0
+
+# Bytes of the receive buffer copied at a time when scanning for '\r\n'
+_SCAN_WINDOW = 64
+
+
+def _set_gc_threshold():
+    """Lets the garbage collector run once a quarter of the free heap
+    has been allocated, on ports which support gc.threshold.
+    """
+    try:
+        gc.threshold(gc.mem_free() // 4)
+    except AttributeError:
+        pass
+
+
+def _mem_free():
+    """Returns the amount of free heap, or None on ports without gc.mem_free."""
+    try:
+        return gc.mem_free()
+    except AttributeError:
+        return None
+
+
+def _find_crlf(view, start, end):
+    """Returns the index of the first '\r\n' within view[start:end], or -1.
+    bytearray has no find() on CircuitPython, so bytes copies of small
+    windows are scanned, keeping the garbage in step with the line length.
+    """
+    while end - start > 1:
+        stop = min(start + _SCAN_WINDOW, end)
+        idx = bytes(view[start:stop]).find(b"\r\n")
+        if idx >= 0:
+            return start + idx
+        # overlap the windows by a byte, '\r\n' may straddle them
+        start = stop - 1
+    return -1
+
 
 class Ethernet_Exception(Exception):
     """Exception raised on ethernet errors."""
     # pylint: disable=unnecessary-pass
     pass
 
+class _ManagedSocket:
+    """Socket handed to adafruit_requests, reading lines and data through
+    the manager so bytes readline received ahead are not lost.
+    """
+
+    def __init__(self, sock, manager):
+        self._sock = sock
+        self._manager = manager
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+    def readline(self):
+        """Returns the next line, without the '\r\n'."""
+        return self._manager.readline(self._sock)
+
+    def recv(self, bufsize):
+        """Reads up to bufsize bytes, starting with any buffered by readline."""
+        return self._manager.recv(self._sock, bufsize)
+
+    def recv_into(self, buf, nbytes=0):
+        """Reads into buf, starting with any bytes buffered by readline."""
+        return self._manager.recv_into(self._sock, buf, nbytes)
+
+
+class _SocketModule:
+    """Stands in for the socket module given to adafruit_requests,
+    wrapping every socket it creates in a _ManagedSocket.
+    """
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getattr__(self, name):
+        return getattr(socket, name)
+
+    def socket(self, *args, **kwargs):
+        """Creates a socket whose reads go through the manager."""
+        return _ManagedSocket(socket.socket(*args, **kwargs), self._manager)
+
+
 class EthernetManager:
     """Class to assist manage interfacing with ethernet hardware.
     This class currently supports the Wiznet 5500 ethernet interface.
@@ -64,6 +151,12 @@ class EthernetManager:
     :param bool debug: Enable library debugging.
     """
 
+    # Receive buffer shared by readline, allocated once at import.
+    _RECV_BUF = bytearray(1024)
+    _RECV_MV = memoryview(_RECV_BUF)
+    # Seconds is_connected reuses its last link check for.
+    _LINK_TTL = 1.0
+
     def __init__(self, spi, cs, rst=None, status_pixel=None, debug=False):
         if rst is not None:
             self.eth = wiznet.WIZNET5K(spi, cs, rst)
@@ -71,9 +164,16 @@ class EthernetManager:
             self.eth = wiznet.WIZNET5K(spi, cs)
         self.debug = debug
         self.statuspix = status_pixel
-        self.pixel_status(0)
-        sock = socket.socket()
-        requests.set_socket(socket, self)
+        self._rxsock = None
+        self._rxoff = 0
+        self._rxend = 0
+        self._link_cached = False
+        self._link_expiry = 0
+        self._last_ifconfig = None
+        _set_gc_threshold()
+        self._set_pixel(_LED_OFF)
+        if requests is not None:
+            requests.set_socket(_SocketModule(self), self)
 
 
     def __enter__(self):
@@ -85,16 +185,40 @@ class EthernetManager:
     def deinit(self):
         """De-initializes ethernet interface.
         """
+        self._drop_rx()
         self.eth = None
 
+    @property
+    def statuspix(self):
+        """Returns the status pixel, or None if there isn't one."""
+        return self._statuspix
+
+    @statuspix.setter
+    def statuspix(self, status_pixel):
+        """Sets the status pixel, resolving how to set its color once.
+        :param status_pixel: NeoPixel, DotStar, RGB LED or None.
+        """
+        self._statuspix = status_pixel
+        if not status_pixel:
+            self._set_pixel = lambda value: None
+        elif hasattr(status_pixel, "color"):
+            self._set_pixel = lambda value: setattr(status_pixel, "color", value)
+        else:
+            self._set_pixel = status_pixel.fill
+
     @property
     def is_connected(self):
         """Returns if an ethernet cable is physically connected
         and if the device has an assigned IP Address.
+        The result is cached for up to a second to avoid polling the
+        ethernet interface on every request.
         """
-        if self.eth.ifconfig()[0] == "0.0.0.0":
-            return False
-        return self.eth.connected
+        now = time.monotonic()
+        if now < self._link_expiry:
+            return self._link_cached
+        self._link_cached = self.eth.ifconfig()[0] != "0.0.0.0" and self.eth.connected
+        self._link_expiry = now + self._LINK_TTL
+        return self._link_cached
 
     @property
     def dhcp(self):
@@ -107,80 +231,223 @@ class EthernetManager:
         :param bool is_active: Set True to activate dhcp.
         """
         self.eth.dhcp = is_active
-        return
+        self._last_ifconfig = None
+        self._link_expiry = 0
 
     @property
     def ifconfig(self):
         """Returns a tuple consisting of the ip_address,
         subnet_mask, gateway_address, and the dns_server.
         """
-        return self.eth.ifconfig
+        return self.eth.ifconfig()
 
-    @ifconfig.setter
-    def ifconfig(self, ip_address, subnet_mask, gateway_address, dns_server):
+    def set_ifconfig(self, ip_address, subnet_mask, gateway_address, dns_server):
         """Sets and configures the ethernet interface. Turns dhcp off, if it was on.
+        Repeating the last configuration set does not write to the interface again.
         :param str ip_address: Interface's ip address.
         :param str subnet_mask: Interface's subnet mask.
         :param str gateway_address: Interface's gateway address.
         :param str dns_server: Interface's dns server.
         """
+        config = (ip_address, subnet_mask, gateway_address, dns_server)
+        if config == self._last_ifconfig:
+            return
         self.eth.ifconfig(ip_address, subnet_mask, gateway_address, dns_server)
-        return
+        self._last_ifconfig = config
+        self._link_expiry = 0
 
     @property
     def ip_address(self):
         """Returns the IP Address as a formatted string"""
-        return self.ifconfig()[0]
+        return self.ifconfig[0]
+
+    @staticmethod
+    def gc_collect_now():
+        """Runs a full garbage collection. Call this at a point where a pause
+        is acceptable, such as between requests, before a large allocation.
+        """
+        gc.collect()
 
     def reset(self):
         raise NotImplementedError(
             "Reset pin must be provided to EthernetManager prior to initialization."
         )
 
+    def _drop_rx(self):
+        """Forgets the socket readline was reading from."""
+        self._rxsock = None
+        self._rxoff = self._rxend = 0
+
+    def _fail_rx(self, sock):
+        """Drops the readline state and closes the socket after a failed read."""
+        self._drop_rx()
+        sock.close()
+        raise RuntimeError("Didn't receive full response, failing out")
+
     def readline(self, sock, timeout=1):
         """CPython socket readline implementation, returns bytes
-        up to, but not including '\r\n'
+        up to, but not including '\r\n'. Data received past the '\r\n'
+        is kept and returned by the next call on the same socket.
+        This may include the start of a response body, so read what follows
+        the lines with :meth:`recv` or :meth:`read_exact`, not sock.recv.
+        Sockets created through adafruit_requests already do so.
+        readline is not reentrant, all instances share one receive buffer.
         :param sock: Socket object
         :param int timeout: Socket read timeout, in seconds.
         NOTE: timeout parameter will be removed when native socket timeout is fixed.
         """
         if not self.is_connected:
             self.connect()
-        time.sleep(0.05)
-        initial = time.monotonic()
-        line = bytes()
-        while b"\r\n" not in line:
-            data = sock.recv(1)
-            line += data
-            if timeout > 0 and time.monotonic() - initial > timeout or not data:
-                sock.close()
-                raise RuntimeError("Didn't receive full response, failing out")
-                break
-        # Remove EOL
-        line = line.split(b"\r\n",1)
-        gc.collect()
-        return line[0]
+        if sock is not self._rxsock:
+            self._drop_rx()
+            self._rxsock = sock
+        return self._readline_buffered(sock, timeout)
+
+    def _readline_buffered(self, sock, timeout):
+        """Reads a line into the shared receive buffer with recv_into."""
+        buf = self._RECV_BUF
+        view = self._RECV_MV
+        off = self._rxoff
+        end = self._rxend
+        if off == end:
+            off = end = 0
+        idx = _find_crlf(view, off, end)
+        if idx < 0:
+            time.sleep(0.05)
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        line = None
+        while idx < 0:
+            if end == len(buf):
+                if not off:
+                    # line is longer than the buffer, spill all but the
+                    # last byte, which may be the '\r' of the '\r\n'
+                    if line is None:
+                        line = bytearray()
+                    line.extend(view[:end - 1])
+                    buf[0] = buf[end - 1]
+                    end = 1
+                else:
+                    # move the partial line to the front to make room
+                    end -= off
+                    view[:end] = view[off:off + end]
+                    off = 0
+            size = sock.recv_into(view[end:])
+            # resume the scan a byte back, '\r\n' may straddle two reads
+            start = max(off, end - 1)
+            end += size
+            if not size or deadline is not None and time.monotonic() > deadline:
+                self._fail_rx(sock)
+            idx = _find_crlf(view, start, end)
+        self._rxoff = idx + 2
+        self._rxend = end
+        if self._rxoff == end:
+            # nothing buffered past this line, don't keep the socket alive
+            self._rxsock = None
+        if line is not None:
+            line.extend(view[off:idx])
+            return bytes(line)
+        return bytes(view[off:idx])
+
+    def recv(self, sock, bufsize):
+        """Reads up to bufsize bytes from the socket like sock.recv, returning
+        data readline received past its last line first.
+        :param sock: Socket object
+        :param int bufsize: Maximum amount of bytes to return.
+        """
+        if sock is not self._rxsock:
+            return sock.recv(bufsize)
+        off = self._rxoff
+        count = min(bufsize, self._rxend - off)
+        self._rxoff += count
+        if self._rxoff == self._rxend:
+            self._rxsock = None
+        return bytes(self._RECV_MV[off:off + count])
+
+    def recv_into(self, sock, buf, nbytes=0):
+        """Reads up to nbytes bytes, or len(buf) when 0, into buf like
+        sock.recv_into, copying data readline received past its last line
+        first. Returns the amount of bytes read.
+        :param sock: Socket object
+        :param buf: Writable buffer, such as a bytearray or memoryview.
+        :param int nbytes: Maximum amount of bytes to read.
+        """
+        if sock is not self._rxsock:
+            if nbytes:
+                return sock.recv_into(buf, nbytes)
+            return sock.recv_into(buf)
+        off = self._rxoff
+        count = min(nbytes or len(buf), self._rxend - off)
+        buf[:count] = self._RECV_MV[off:off + count]
+        self._rxoff += count
+        if self._rxoff == self._rxend:
+            self._rxsock = None
+        return count
+
+    def read_exact(self, sock, size, timeout=1):
+        """Reads exactly size bytes from the socket into a new bytearray,
+        starting with any data readline received past its last line.
+        :param sock: Socket object
+        :param int size: Amount of bytes to read, such as a Content-Length.
+        :param int timeout: Socket read timeout, in seconds.
+        """
+        buf = bytearray(size)
+        buf_view = memoryview(buf)
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        off = 0
+        while off < size:
+            count = self.recv_into(sock, buf_view[off:])
+            if not count or deadline is not None and time.monotonic() > deadline:
+                self._fail_rx(sock)
+            off += count
+        return buf
 
     def connect(self, attempts=30):
         """Attempts connecting with ethernet using the current settings.
         Returns True if ethernet interface is connected.
-        :param int attempts: Optional amount of connection failures before returning False.
+        :param int attempts: Optional amount of seconds to wait for a dhcp lease
+            before raising Ethernet_Exception.
         """
-        failure_count = 0
         if self.eth.connected:
             if self.debug:
                 print("Checking for dhcp server...")
-            self.pixel_status((100, 0, 0))
-            while self.eth.ifconfig()[0] == "0.0.0.0":
-                failure_count += 1
-                if failure_count >= attempts:
+            self._set_pixel(_LED_WAIT)
+            deadline = time.monotonic() + attempts
+            delay = 0.05
+            while True:
+                cfg = self.eth.ifconfig()
+                if cfg[0] != "0.0.0.0":
+                    break
+                if time.monotonic() >= deadline:
                     raise Ethernet_Exception("Maximum connection attempts exceeded.")
-                time.sleep(1)
-            self.pixel_status((0, 100, 0))
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+            self._set_pixel(_LED_OK)
+            # collect now, before the first request, rather than on the hot path
+            if self.debug:
+                print("Free memory before gc: ", _mem_free())
+            gc.collect()
+            _set_gc_threshold()
+            if self.debug:
+                print("Free memory after gc: ", _mem_free())
+            self._link_cached = True
+            self._link_expiry = time.monotonic() + self._LINK_TTL
             return True
         else:
+            self._link_expiry = 0
             raise Ethernet_Exception("Disconnected - Plug an ethernet cable in.")
 
+    def _request(self, method, url, **kw):
+        """Pass the request to requests, updating the status LED around it."""
+        if requests is None:
+            raise ImportError("adafruit_requests is required for HTTP requests.")
+        if not self.is_connected:
+            self.connect()
+        self._set_pixel(_LED_BUSY)
+        try:
+            return requests.request(method, url, **kw)
+        finally:
+            self._set_pixel(_LED_OFF)
+
     def get(self, url, **kw):
         """
         Pass the Get request to requests and update status LED
@@ -193,87 +460,35 @@ class EthernetManager:
         :return: The response from the request
         :rtype: Response
         """
-        if not self.is_connected:
-            self.connect()
-        self.pixel_status((0, 0, 100))
-        return_val = requests.get(url, **kw)
-        self.pixel_status(0)
-        return return_val
+        return self._request("GET", url, **kw)
 
     def post(self, url, **kw):
         """
-        Pass the Post request to requests and update status LED
-
-        :param str url: The URL to post data to
-        :param dict data: (Optional) Form data to submit
-        :param dict json: (Optional) JSON data to submit. (Data must be None)
-        :param dict header: (Optional) Header data to include
-        :param bool stream: (Optional) Whether to stream the Response
-        :return: The response from the request
-        :rtype: Response
+        Pass the Post request to requests and update status LED.
+        Takes the same arguments as :meth:`get`.
         """
-        if not self.is_connected:
-            self.connect()
-        self.pixel_status((0, 0, 100))
-        return_val = requests.post(url, **kw)
-        return return_val
+        return self._request("POST", url, **kw)
 
     def put(self, url, **kw):
         """
-        Pass the put request to requests and update status LED
-
-        :param str url: The URL to PUT data to
-        :param dict data: (Optional) Form data to submit
-        :param dict json: (Optional) JSON data to submit. (Data must be None)
-        :param dict header: (Optional) Header data to include
-        :param bool stream: (Optional) Whether to stream the Response
-        :return: The response from the request
-        :rtype: Response
+        Pass the put request to requests and update status LED.
+        Takes the same arguments as :meth:`get`.
         """
-        if not self.is_connected:
-            self.connect()
-        self.pixel_status((0, 0, 100))
-        return_val = requests.put(url, **kw)
-        self.pixel_status(0)
-        return return_val
+        return self._request("PUT", url, **kw)
 
     def patch(self, url, **kw):
         """
-        Pass the patch request to requests and update status LED
-
-        :param str url: The URL to PUT data to
-        :param dict data: (Optional) Form data to submit
-        :param dict json: (Optional) JSON data to submit. (Data must be None)
-        :param dict header: (Optional) Header data to include
-        :param bool stream: (Optional) Whether to stream the Response
-        :return: The response from the request
-        :rtype: Response
+        Pass the patch request to requests and update status LED.
+        Takes the same arguments as :meth:`get`.
         """
-        if not self.is_connected:
-            self.connect()
-        self.pixel_status((0, 0, 100))
-        return_val = requests.patch(url, **kw)
-        self.pixel_status(0)
-        return return_val
+        return self._request("PATCH", url, **kw)
 
     def delete(self, url, **kw):
         """
-        Pass the delete request to requests and update status LED
-
-        :param str url: The URL to PUT data to
-        :param dict data: (Optional) Form data to submit
-        :param dict json: (Optional) JSON data to submit. (Data must be None)
-        :param dict header: (Optional) Header data to include
-        :param bool stream: (Optional) Whether to stream the Response
-        :return: The response from the request
-        :rtype: Response
+        Pass the delete request to requests and update status LED.
+        Takes the same arguments as :meth:`get`.
         """
-        if not self.is_connected:
-            self.connect()
-        self.pixel_status((0, 0, 100))
-        return_val = requests.delete(url, **kw)
-        self.pixel_status(0)
-        return return_val
+        return self._request("DELETE", url, **kw)
 
     def pixel_status(self, value):
         """
@@ -282,8 +497,4 @@ class EthernetManager:
         :param value: The value to set the Board's status LED to
         :type value: int or 3-value tuple
         """
-        if self.statuspix:
-            if hasattr(self.statuspix, "color"):
-                self.statuspix.color = value
-            else:
-                self.statuspix.fill(value)
+        self._set_pixel(value)